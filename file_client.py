@@ -5,18 +5,46 @@ CLI app - CLI application to retrieve and print data
 @author: Kristijan <kristijan.sarin@gmail.com>
 """
 
+import asyncio
+import atexit
+import codecs
+import contextlib
+import errno
+import functools
+import itertools
 import click
 import requests
+from requests.adapters import HTTPAdapter
 import grpc
+import grpc.aio
 import logging
+import mmap
+import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from queue import Empty, Queue
 from typing import Union
 import service_file_pb2
 import service_file_pb2_grpc
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Prefer the C-accelerated JSON parser when it is installed
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# aiohttp is only needed for REST batches
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Logging is silent unless the CLI is run with --verbose
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_log = logging.getLogger(__name__)
+_log.addHandler(logging.NullHandler())
 
 # Error messages
 ERROR_MESSAGES = {
@@ -25,125 +53,657 @@ ERROR_MESSAGES = {
     "unexpected_error": "An unexpected error occurred. Please try again."
 }
 
-def output_metadata(name, size, mimetype, create_datetime, output):
-    """Formats and outputs file metadata."""
+# REST endpoints, relative to the base URL without its trailing slash
+REST_STAT_URL = '{base}/file/{uuid}/stat/'
+REST_READ_URL = '{base}/file/{uuid}/read/'
+REST_STATREAD_URL = '{base}/file/{uuid}/readfull/'
+
+# Error message keys for HTTP status codes returned by the REST backend
+REST_STATUS_ERRORS = {
+    404: "not_found",
+    502: "server_unreachable",
+    503: "server_unreachable",
+    504: "server_unreachable",
+}
+
+# Size of the chunks streamed from the backends to the output
+CHUNK_SIZE = 1024 * 1024
+
+# Number of chunks fetched ahead of the one being written
+PREFETCH_DEPTH = 2
+
+# Marks the end of a prefetched stream
+_END_OF_STREAM = object()
+
+# Maximum number of UUIDs a batch fetches at the same time
+BATCH_CONCURRENCY = 32
+
+# (connect, read) timeouts in seconds for REST requests
+REST_TIMEOUT = (3, 30)
+
+# Connections kept per host by the shared HTTP session
+REST_POOL_MAXSIZE = 16
+
+# Shared HTTP session so repeated calls reuse pooled TCP/TLS connections
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=REST_POOL_MAXSIZE)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
+# Options applied to every gRPC channel
+GRPC_CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.max_receive_message_length', 256 * 1024 * 1024),
+]
+
+# Compression applied to messages sent on gRPC channels
+GRPC_COMPRESSION = grpc.Compression.Gzip
+
+# Open gRPC channel pools as (channel, stub) pairs keyed by (server address, pool size), reused across calls
+_CHANNELS = {}
+_CHANNELS_LOCK = threading.Lock()
+
+# Round-robin counter used to pick a channel from a pool
+_POOL_COUNTER = itertools.count()
+
+def _metadata_report(name, size, mimetype, create_datetime, output):
+    """Formats file metadata, saving it unless `output` is stdout, and returns the styled text to show."""
     metadata = (f"File Metadata:\n- Name: {name}\n- Size: {size} bytes\n"
                 f"- MIME Type: {mimetype}\n- Created: {create_datetime}")
     if output == '-':
-        click.secho(metadata, fg='green')
-    else:
-        with open(output, 'w') as f:
-            f.write(metadata)
-        click.secho(f"Metadata saved to {output}", fg='cyan')
+        return click.style(metadata, fg='green')
+    with open(output, 'w') as f:
+        f.write(metadata)
+    return click.style(f"Metadata saved to {output}", fg='cyan')
+
+def output_metadata(name, size, mimetype, create_datetime, output):
+    """Formats and outputs file metadata."""
+    click.echo(_metadata_report(name, size, mimetype, create_datetime, output))
+
+def _copy_into(mm, chunks, start, end):
+    """Copies chunks into `mm[start:end]`, failing unless they fill the range exactly."""
+    offset = start
+    for chunk in chunks:
+        stop = offset + len(chunk)
+        if stop > end:
+            raise OSError(f"stream is longer than the expected {end - start} bytes")
+        mm[offset:stop] = chunk
+        offset = stop
+    if offset < end:
+        raise OSError(f"stream ended after {offset - start} of {end - start} bytes")
+
+def _presize(f, length):
+    """Grows the empty file `f` to `length` bytes, reserving its blocks up front where supported."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, length)
+            return
+        except OSError as e:
+            # Only a filesystem without fallocate support may fall back to a sparse file;
+            # ENOSPC and friends must surface here rather than as SIGBUS through the mmap
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+    f.truncate(length)
+
+@contextlib.contextmanager
+def _discard_on_error(output):
+    """Removes `output` if writing it fails, since a pre-sized file would otherwise look complete."""
+    try:
+        yield
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(output)
+        raise
+
+def _copy_to_mmap(chunks, output, length):
+    """Copies chunks totalling `length` bytes into `output` through a memory map of the pre-sized file."""
+    with open(output, 'w+b') as f:
+        _presize(f, length)
+        with mmap.mmap(f.fileno(), length) as mm:
+            _copy_into(mm, chunks, 0, length)
+            mm.flush()
+
+def _prefetch(chunks, close=None, depth=PREFETCH_DEPTH):
+    """
+    Yields from `chunks` while a background thread receives up to `depth` chunks ahead.
+
+    When the consumer stops early, `close` is called to abort a receive in
+    progress, and the thread is joined before the generator finishes closing.
+    """
+    queue = Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if stopped.is_set():
+                    return
+                queue.put(chunk)
+            queue.put(_END_OF_STREAM)
+        except Exception as e:
+            queue.put(e)
+
+    producer = threading.Thread(target=produce, name='file-client-prefetch', daemon=True)
+    producer.start()
+    finished = False
+    try:
+        while True:
+            item = queue.get()
+            if item is _END_OF_STREAM:
+                finished = True
+                return
+            if isinstance(item, Exception):
+                finished = True
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        if not finished and close is not None:
+            close()
+        # Unblock a producer waiting on a full queue, so it can see `stopped` and exit
+        while producer.is_alive():
+            try:
+                queue.get(timeout=0.1)
+            except Empty:
+                pass
+
+def _write_blocks(fd, view, block):
+    """Writes all of the block-aligned `view` to the O_DIRECT `fd`, failing if a short write breaks alignment."""
+    offset = 0
+    while offset < len(view):
+        with view[offset:] as rest:
+            n = os.write(fd, rest)
+        if n <= 0 or n % block:
+            raise OSError(errno.EIO, f"short O_DIRECT write of {n} of {len(view) - offset} bytes")
+        offset += n
+
+def _copy_direct(chunks, output):
+    """Writes chunks to `output` opened with O_DIRECT, staging them in a page-aligned buffer."""
+    block = mmap.PAGESIZE
+    size = -(-CHUNK_SIZE // block) * block
+    fd = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o666)
+    try:
+        with mmap.mmap(-1, size) as buf, memoryview(buf) as staged:
+            filled = written = 0
+            for chunk in chunks:
+                with memoryview(chunk) as view:
+                    while view:
+                        n = min(len(view), size - filled)
+                        staged[filled:filled + n] = view[:n]
+                        filled += n
+                        view = view[n:]
+                        if filled == size:
+                            _write_blocks(fd, staged, block)
+                            written += size
+                            filled = 0
+            if filled:
+                # O_DIRECT only writes whole blocks, so pad the tail and trim the file afterwards
+                with staged[:-(-filled // block) * block] as tail:
+                    _write_blocks(fd, tail, block)
+                os.ftruncate(fd, written + filled)
+    finally:
+        os.close(fd)
+
+def _text_encoding(mimetype):
+    """Returns the charset of a textual `mimetype`, or None for binary content."""
+    media_type, _, params = mimetype.partition(';')
+    if not media_type.strip().lower().startswith('text/'):
+        return None
+    for param in params.split(';'):
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            try:
+                return codecs.lookup(value.strip().strip('"')).name
+            except LookupError:
+                break
+    return 'utf-8'
+
+def _echo_chunks(chunks, encoding=None):
+    """Writes chunks to stdout as is, decoding them only when text in `encoding` goes to a terminal."""
+    if encoding and sys.stdout.isatty():
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        for chunk in chunks:
+            click.secho(decoder.decode(chunk), fg='green', nl=False)
+        click.secho(decoder.decode(b'', final=True), fg='green')
+        return
+    for chunk in chunks:
+        sys.stdout.buffer.write(chunk)
+    sys.stdout.buffer.flush()
+
+def _save_chunks(chunks, output, length=None, direct=False, encoding=None, close=None):
+    """
+    Writes content chunks to stdout or `output`.
+
+    The file is memory mapped when its `length` is known, or written with
+    O_DIRECT past the page cache when `direct` is set. Text in `encoding`
+    is decoded when shown on a terminal. `close` aborts the source of
+    `chunks` if writing fails before it is exhausted.
+    """
+    # Receive the next chunks while the current one is written; closing the
+    # prefetcher joins its thread before the caller releases the source
+    with contextlib.closing(_prefetch(chunks, close)) as chunks:
+        if output == '-':
+            _echo_chunks(chunks, encoding)
+            return
+        with _discard_on_error(output):
+            if direct:
+                _copy_direct(chunks, output)
+            elif length:
+                _copy_to_mmap(chunks, output, length)
+            else:
+                with open(output, 'wb') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
 
 # REST API Client
+def _content_length(response):
+    """Returns the body size announced by `response`, or None if it is unknown or encoded."""
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+def _rest_url(template, base_url, uuid):
+    """Builds the endpoint URL for `uuid`, tolerating a trailing slash on `base_url`."""
+    return template.format(base=base_url.rstrip('/'), uuid=uuid)
+
+def _check_status(response):
+    """Reports the matching error and exits unless `response` has a 2xx status."""
+    code = response.status_code
+    if 200 <= code < 300:
+        return
+    key = REST_STATUS_ERRORS.get(code, "unexpected_error")
+    if key == "unexpected_error":
+        _log.error("REST request to %s failed with HTTP %s", response.url, code)
+    click.secho(ERROR_MESSAGES[key], fg='red')
+    raise SystemExit(1)
+
+def _abort_response(response):
+    """Interrupts a read blocked on `response` in another thread and drops its connection."""
+    # HTTPResponse.shutdown() exists since urllib3 2.3; older versions can only close
+    shutdown = getattr(response.raw, 'shutdown', None)
+    if shutdown is not None:
+        shutdown()
+    response.close()
+
+def _save_response(response, output, direct=False):
+    """Copies the body of a streamed `response` to stdout or `output`."""
+    # Copy straight from the urllib3 stream, still undoing any Content-Encoding.
+    # os.sendfile() is no option here: Linux rejects a socket as its source, and
+    # the body may be chunk-framed or already partly buffered by http.client.
+    response.raw.decode_content = True
+    chunks = iter(functools.partial(response.raw.read, CHUNK_SIZE), b'')
+    close = functools.partial(_abort_response, response)
+    if output == '-':
+        _save_chunks(chunks, output, encoding=_text_encoding(response.headers.get('Content-Type', '')),
+                     close=close)
+    else:
+        _save_chunks(chunks, output, _content_length(response), direct, close=close)
+
+def _read_range(url, mm, start, end):
+    """Fetches bytes `start` to `end` (exclusive) of `url` into the same range of `mm`."""
+    headers = {'Range': f'bytes={start}-{end - 1}', 'Accept-Encoding': 'identity'}
+    with _SESSION.get(url, headers=headers, stream=True, timeout=REST_TIMEOUT) as response:
+        if response.status_code != 206:
+            raise OSError(f"range {start}-{end - 1} not served (HTTP {response.status_code})")
+        # Content-Range looks like "bytes <first>-<last>/<total>"
+        served = response.headers.get('Content-Range', '')
+        if not served.startswith(f'bytes {start}-'):
+            raise OSError(f"range {start}-{end - 1} answered with Content-Range {served!r}")
+        _copy_into(mm, response.iter_content(chunk_size=CHUNK_SIZE), start, end)
+
+def _read_ranges(url, output, workers):
+    """
+    Downloads `url` into `output` with up to `workers` concurrent Range requests.
+
+    Returns False without touching `output` when the server does not advertise
+    byte ranges or the body is too small to be worth splitting.
+    """
+    # More workers than pooled connections would make urllib3 discard connections instead of reusing them
+    workers = min(workers, REST_POOL_MAXSIZE)
+    head = _SESSION.head(url, headers={'Accept-Encoding': 'identity'}, timeout=REST_TIMEOUT)
+    length = _content_length(head)
+    if head.status_code != 200 or head.headers.get('Accept-Ranges') != 'bytes' or not length:
+        return False
+    step = max(-(-length // workers), CHUNK_SIZE)
+    if step >= length:
+        return False
+    with _discard_on_error(output), open(output, 'w+b') as f:
+        _presize(f, length)
+        with mmap.mmap(f.fileno(), length) as mm:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_read_range, url, mm, start, min(start + step, length))
+                           for start in range(0, length, step)]
+                for future in futures:
+                    future.result()
+            mm.flush()
+    return True
+
 def rest_stat(base_url, uuid, output):
     try:
-        url = f"{base_url}/file/{uuid}/stat/"
-        response = requests.get(url)
-        if response.status_code == 404:
-            click.secho(ERROR_MESSAGES["not_found"], fg='red')
-            raise SystemExit(1)
-        response.raise_for_status()
-        data = response.json()
+        url = _rest_url(REST_STAT_URL, base_url, uuid)
+        response = _SESSION.get(url, timeout=REST_TIMEOUT)
+        _check_status(response)
+        data = _json_loads(response.content)
         output_metadata(data['name'], data['size'], data['mimetype'], data['create_datetime'], output)
     except requests.ConnectionError:
         click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
         raise SystemExit(1)
     except Exception as e:
-        logging.error(f"Error during REST stat request: {e}")
+        _log.error("Error during REST stat request: %s", e)
         click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
         raise SystemExit(1)
 
-def rest_read(base_url, uuid, output):
+def rest_read(base_url, uuid, output, workers=1, direct=False):
     try:
-        url = f"{base_url}/file/{uuid}/read/"
-        response = requests.get(url)
-        if response.status_code == 404:
-            click.secho(ERROR_MESSAGES["not_found"], fg='red')
-            raise SystemExit(1)
-        response.raise_for_status()
-        content = response.content
-        if output == '-':
-            click.secho(content.decode(errors="replace"), fg='green')
-        else:
-            with open(output, 'wb') as f:
-                f.write(content)
+        url = _rest_url(REST_READ_URL, base_url, uuid)
+        if output != '-' and workers > 1 and not direct and _read_ranges(url, output, workers):
             click.secho(f"Content saved to {output}", fg='cyan')
+            return
+        with _SESSION.get(url, stream=True, timeout=REST_TIMEOUT) as response:
+            _check_status(response)
+            _save_response(response, output, direct)
+            if output != '-':
+                click.secho(f"Content saved to {output}", fg='cyan')
     except requests.ConnectionError:
         click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
         raise SystemExit(1)
     except Exception as e:
-        logging.error(f"Error during REST read request: {e}")
+        _log.error("Error during REST read request: %s", e)
+        click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
+        raise SystemExit(1)
+
+def rest_statread(base_url, uuid, output, direct=False):
+    try:
+        url = _rest_url(REST_STATREAD_URL, base_url, uuid)
+        with _SESSION.get(url, stream=True, timeout=REST_TIMEOUT) as response:
+            _check_status(response)
+            headers = response.headers
+            output_metadata(headers['X-Meta-Name'], headers['X-Meta-Size'], headers['X-Meta-Mimetype'],
+                            headers['X-Meta-Create-Datetime'], '-')
+            _save_response(response, output, direct)
+            if output != '-':
+                click.secho(f"Content saved to {output}", fg='cyan')
+    except requests.ConnectionError:
+        click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
+        raise SystemExit(1)
+    except Exception as e:
+        _log.error("Error during REST statread request: %s", e)
         click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
         raise SystemExit(1)
 
 # gRPC Client
-def grpc_stat(grpc_server, uuid, output):
+def _pool(grpc_server, pool_size=1):
+    """Returns the cached (channel, stub) pairs for `grpc_server`, opening them on first use."""
+    key = (grpc_server, pool_size)
+    pool = _CHANNELS.get(key)
+    if pool is None:
+        with _CHANNELS_LOCK:
+            # Another thread may have opened the pool while this one waited for the lock
+            pool = _CHANNELS.get(key)
+            if pool is None:
+                options = GRPC_CHANNEL_OPTIONS
+                if pool_size > 1:
+                    # Stop pooled channels from sharing subchannels, so each one gets its own connection
+                    options = options + [('grpc.use_local_subchannel_pool', 1)]
+                channels = [grpc.insecure_channel(grpc_server, options=options, compression=GRPC_COMPRESSION)
+                            for _ in range(pool_size)]
+                pool = tuple((channel, service_file_pb2_grpc.FileServiceStub(channel)) for channel in channels)
+                _CHANNELS[key] = pool
+    return pool
+
+def _stub(grpc_server, pool_size=1):
+    """Returns the next stub for `grpc_server`, spreading calls round-robin over the pool."""
+    pool = _pool(grpc_server, pool_size)
+    return pool[next(_POOL_COUNTER) % len(pool)][1]
+
+def _close_channels():
+    """Closes all cached channels."""
+    with _CHANNELS_LOCK:
+        while _CHANNELS:
+            _, pool = _CHANNELS.popitem()
+            for channel, _ in pool:
+                channel.close()
+
+atexit.register(_close_channels)
+
+def grpc_stat(grpc_server, uuid, output, pool_size=1):
     try:
-        with grpc.insecure_channel(grpc_server) as channel:
-            stub = service_file_pb2_grpc.FileServiceStub(channel)
-            request = service_file_pb2.StatRequest(uuid=uuid)
-            response = stub.Stat(request)
-            output_metadata(response.name, response.size, response.mimetype, response.create_datetime, output)
+        stub = _stub(grpc_server, pool_size)
+        request = service_file_pb2.StatRequest(uuid=uuid)
+        response = stub.Stat(request)
+        output_metadata(response.name, response.size, response.mimetype, response.create_datetime, output)
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
             click.secho(ERROR_MESSAGES["not_found"], fg='red')
         else:
             click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
-        logging.error(f"gRPC Error during stat request: {e}")
+        _log.error("gRPC Error during stat request: %s", e)
         raise SystemExit(1)
     except Exception as e:
-        logging.error(f"Unexpected error during gRPC stat request: {e}")
+        _log.error("Unexpected error during gRPC stat request: %s", e)
         click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
         raise SystemExit(1)
 
-def grpc_read(grpc_server, uuid, output):
+def grpc_read(grpc_server, uuid, output, pool_size=1, direct=False):
     try:
-        with grpc.insecure_channel(grpc_server) as channel:
-            stub = service_file_pb2_grpc.FileServiceStub(channel)
-            request = service_file_pb2.ReadRequest(uuid=uuid)
-            response = stub.Read(request)
-            content = response.content
-            if output == '-':
-                click.secho(content.decode(errors="replace"), fg='green')
-            else:
-                with open(output, 'wb') as f:
-                    f.write(content)
+        stub = _stub(grpc_server, pool_size)
+        # Ask for CHUNK_SIZE replies so the file is never held in memory as a whole
+        request = service_file_pb2.ReadRequest(uuid=uuid, size=CHUNK_SIZE)
+        if output == '-' or direct:
+            call = stub.Read(request)
+            _save_chunks((reply.data.data for reply in call), output, direct=direct, close=call.cancel)
+            if output != '-':
                 click.secho(f"Content saved to {output}", fg='cyan')
+        else:
+            # Stat alongside the stream, so the output can be mapped without waiting an extra round trip
+            stat_call = stub.Stat.future(service_file_pb2.StatRequest(uuid=uuid))
+            call = stub.Read(request)
+            try:
+                length = stat_call.result().size
+            except Exception:
+                call.cancel()
+                raise
+            _save_chunks((reply.data.data for reply in call), output, length, close=call.cancel)
+            click.secho(f"Content saved to {output}", fg='cyan')
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
             click.secho(ERROR_MESSAGES["not_found"], fg='red')
         else:
             click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
-        logging.error(f"gRPC Error during read request: {e}")
+        _log.error("gRPC Error during read request: %s", e)
         raise SystemExit(1)
     except Exception as e:
-        logging.error(f"Unexpected error during gRPC read request: {e}")
+        _log.error("Unexpected error during gRPC read request: %s", e)
         click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
         raise SystemExit(1)
 
+def _statread_chunks(replies):
+    """Yields the content of the statread `replies` following the metadata, failing on any other payload."""
+    for reply in replies:
+        if reply.WhichOneof('payload') != 'chunk':
+            raise ValueError("statread sent metadata after the first reply")
+        yield reply.chunk.data
+
+def grpc_statread(grpc_server, uuid, output, pool_size=1, direct=False):
+    try:
+        stub = _stub(grpc_server, pool_size)
+        request = service_file_pb2.ReadRequest(uuid=uuid, size=CHUNK_SIZE)
+        replies = stub.StatRead(request)
+        # The first reply carries the metadata, every following one a content chunk
+        first = next(replies, None)
+        if first is None or first.WhichOneof('payload') != 'meta':
+            replies.cancel()
+            raise ValueError("statread did not start with the file metadata")
+        meta = first.meta
+        output_metadata(meta.name, meta.size, meta.mimetype, meta.create_datetime, '-')
+        _save_chunks(_statread_chunks(replies), output, meta.size, direct,
+                     _text_encoding(meta.mimetype), replies.cancel)
+        if output != '-':
+            click.secho(f"Content saved to {output}", fg='cyan')
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            click.secho(ERROR_MESSAGES["not_found"], fg='red')
+        else:
+            click.secho(ERROR_MESSAGES["server_unreachable"], fg='red')
+        _log.error("gRPC Error during statread request: %s", e)
+        raise SystemExit(1)
+    except Exception as e:
+        _log.error("Unexpected error during gRPC statread request: %s", e)
+        click.secho(ERROR_MESSAGES["unexpected_error"], fg='red')
+        raise SystemExit(1)
+
+# Batch Client
+def _batch_path(output, uuid):
+    """Returns where the result for `uuid` is stored in batch mode, or '-' for stdout."""
+    return output if output == '-' else os.path.join(output, uuid)
+
+def _batch_error_key(e):
+    """Maps an exception raised while fetching one UUID of a batch to an error message key."""
+    if isinstance(e, grpc.RpcError):
+        return "not_found" if e.code() == grpc.StatusCode.NOT_FOUND else "server_unreachable"
+    if aiohttp is not None:
+        if isinstance(e, aiohttp.ClientResponseError):
+            return REST_STATUS_ERRORS.get(e.status, "unexpected_error")
+        if isinstance(e, aiohttp.ClientConnectionError):
+            return "server_unreachable"
+    return "unexpected_error"
+
+async def _rest_fetch(session, command, base_url, uuid, output):
+    """Stats or reads `uuid` from the REST backend, returning its metadata for `stat`."""
+    template = REST_STAT_URL if command == 'stat' else REST_READ_URL
+    async with session.get(_rest_url(template, base_url, uuid)) as response:
+        response.raise_for_status()
+        if command == 'stat':
+            data = _json_loads(await response.read())
+            return data['name'], data['size'], data['mimetype'], data['create_datetime']
+        # Disk I/O runs in worker threads so it never stalls the other fetches on the event loop
+        f = await asyncio.to_thread(open, _batch_path(output, uuid), 'wb')
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+async def _grpc_fetch(stub, command, uuid, output):
+    """Stats or reads `uuid` from the gRPC backend, returning its metadata for `stat`."""
+    if command == 'stat':
+        response = await stub.Stat(service_file_pb2.StatRequest(uuid=uuid))
+        return response.name, response.size, response.mimetype, response.create_datetime
+    request = service_file_pb2.ReadRequest(uuid=uuid, size=CHUNK_SIZE)
+    path = _batch_path(output, uuid)
+    # Open the output only once the server has answered, so failed UUIDs leave no file;
+    # disk I/O runs in worker threads so it never stalls the other fetches on the event loop
+    f = None
+    try:
+        async for reply in stub.Read(request):
+            if f is None:
+                f = await asyncio.to_thread(open, path, 'wb')
+            await asyncio.to_thread(f.write, reply.data.data)
+        if f is None:
+            f = await asyncio.to_thread(open, path, 'wb')
+    finally:
+        if f is not None:
+            await asyncio.to_thread(f.close)
+
+async def _bounded(semaphore, fetch):
+    """Awaits `fetch` once `semaphore` admits it."""
+    async with semaphore:
+        return await fetch
+
+async def _batch(command, uuids, backend, grpc_server, base_url, output):
+    """Runs `command` for all `uuids` over one session or channel, at most BATCH_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    if backend == 'grpc':
+        async with grpc.aio.insecure_channel(grpc_server, options=GRPC_CHANNEL_OPTIONS,
+                                             compression=GRPC_COMPRESSION) as channel:
+            stub = service_file_pb2_grpc.FileServiceStub(channel)
+            fetches = [_grpc_fetch(stub, command, uuid, output) for uuid in uuids]
+            return await asyncio.gather(*[_bounded(semaphore, fetch) for fetch in fetches],
+                                        return_exceptions=True)
+    timeout = aiohttp.ClientTimeout(sock_connect=REST_TIMEOUT[0], sock_read=REST_TIMEOUT[1])
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        fetches = [_rest_fetch(session, command, base_url, uuid, output) for uuid in uuids]
+        return await asyncio.gather(*[_bounded(semaphore, fetch) for fetch in fetches],
+                                    return_exceptions=True)
+
+def batch(command, uuids, backend, grpc_server, base_url, output):
+    """Stats or reads many UUIDs concurrently, reporting each result in the order given."""
+    if backend == 'rest' and aiohttp is None:
+        raise click.UsageError("REST batches require the aiohttp package")
+    # UUIDs name the files written under --output, so they must not be able to leave it
+    for uuid in uuids:
+        if '..' in uuid or '/' in uuid or (os.altsep and os.altsep in uuid) or os.sep in uuid:
+            raise click.UsageError(f"Invalid UUID in --uuids-file: {uuid!r}")
+    if output != '-':
+        os.makedirs(output, exist_ok=True)
+    elif command == 'read':
+        raise click.UsageError("Batch reads require --output to name a directory")
+    results = asyncio.run(_batch(command, uuids, backend, grpc_server, base_url, output))
+    # Collect the whole report so it reaches stdout in a single write
+    report = []
+    failed = False
+    for uuid, result in zip(uuids, results):
+        if isinstance(result, Exception):
+            _log.error("Error during batch %s request for %s: %s", command, uuid, result)
+            report.append(click.style(f"{uuid}: {ERROR_MESSAGES[_batch_error_key(result)]}", fg='red'))
+            failed = True
+        elif command == 'stat':
+            report.append(_metadata_report(*result, _batch_path(output, uuid)))
+        else:
+            report.append(click.style(f"Content saved to {_batch_path(output, uuid)}", fg='cyan'))
+    click.echo('\n'.join(report))
+    if failed:
+        raise SystemExit(1)
+
 # CLI Command
 @click.command()
-@click.argument('command', type=click.Choice(['stat', 'read']))
-@click.argument('uuid')
+@click.argument('command', type=click.Choice(['stat', 'read', 'statread']))
+@click.argument('uuid', required=False)
 @click.option('--backend', default='grpc', type=click.Choice(['grpc', 'rest']), help='Set a backend to be used')
 @click.option('--grpc-server', default='localhost:50051', help='gRPC server host:port')
+@click.option('--grpc-pool-size', default=1, type=click.IntRange(min=1), help='Number of gRPC channels to spread calls over')
 @click.option('--base-url', default='http://localhost/', help='Base URL for REST API')
-@click.option('--output', default='-', help='File to store output, default is stdout')
-def file_client(command, uuid, backend, grpc_server, base_url, output):
+@click.option('--rest-workers', default=1, type=click.IntRange(min=1), help='Number of parallel Range requests used to save REST content to a file')
+@click.option('--direct', is_flag=True, help='Write content to --output with O_DIRECT, bypassing the page cache')
+@click.option('--uuids-file', type=click.File('r'), help='File listing UUIDs to fetch concurrently, one per line')
+@click.option('--verbose', is_flag=True, help='Log error details to stderr')
+@click.option('--output', default='-', help='File to store output, default is stdout; a directory with --uuids-file')
+def file_client(command, uuid, backend, grpc_server, grpc_pool_size, base_url, rest_workers, direct, uuids_file, verbose, output):
     """CLI to retrieve file metadata and contents."""
+    if verbose:
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    if (uuid is None) == (uuids_file is None):
+        raise click.UsageError("Pass either a UUID or --uuids-file")
+    if direct and not hasattr(os, 'O_DIRECT'):
+        raise click.UsageError("--direct is not supported on this platform")
+    if direct and (command == 'stat' or output == '-' or uuids_file is not None):
+        raise click.UsageError("--direct needs read or statread with --output naming a file, without --uuids-file")
     click.secho(f"Using {backend.upper()} backend...", fg='blue')
+    if uuids_file is not None:
+        if command == 'statread':
+            raise click.UsageError("statread does not support --uuids-file")
+        if grpc_pool_size > 1 or rest_workers > 1:
+            raise click.UsageError("--grpc-pool-size and --rest-workers cannot be combined with --uuids-file")
+        uuids = [line.strip() for line in uuids_file if line.strip()]
+        batch(command, uuids, backend, grpc_server, base_url, output)
+        return
     if backend == 'grpc':
         if command == 'stat':
-            grpc_stat(grpc_server, uuid, output)
+            grpc_stat(grpc_server, uuid, output, grpc_pool_size)
         elif command == 'read':
-            grpc_read(grpc_server, uuid, output)
+            grpc_read(grpc_server, uuid, output, grpc_pool_size, direct)
+        elif command == 'statread':
+            grpc_statread(grpc_server, uuid, output, grpc_pool_size, direct)
     elif backend == 'rest':
         if command == 'stat':
             rest_stat(base_url, uuid, output)
         elif command == 'read':
-            rest_read(base_url, uuid, output)
+            rest_read(base_url, uuid, output, rest_workers, direct)
+        elif command == 'statread':
+            rest_statread(base_url, uuid, output, direct)
 
 if __name__ == '__main__':
     file_client()
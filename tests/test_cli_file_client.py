@@ -7,31 +7,69 @@ test_cli_file_client.py - Unit tests for the `file_client.py` CLI application.
 @author: Kristijan <kristijan.sarin@gmail.com>
 """
 
+import asyncio
+import errno
+import io
+import json
+import logging
+import os
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
+import grpc
 from click.testing import CliRunner
+import file_client as file_client_module
 from file_client import file_client
 
+class MockRpcError(grpc.RpcError):
+    """gRPC error carrying a fixed status code."""
+
+    def __init__(self, code):
+        super().__init__()
+        self._code = code
+
+    def code(self):
+        return self._code
+
+class MockStreamCall:
+    """Server-streaming gRPC call yielding fixed replies."""
+
+    def __init__(self, replies):
+        self._replies = iter(replies)
+        self.cancelled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._replies)
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
 class TestFileClient(unittest.TestCase):
 
     def setUp(self):
         self.runner = CliRunner()
 
-    @patch('file_client.requests.get')
+    @patch('file_client._SESSION.get')
     def test_rest_stat_success(self, mock_get):
         # Simulate a successful REST response for metadata
-        mock_get.return_value.json.return_value = {
+        mock_get.return_value.content = json.dumps({
             'name': 'example.txt',
             'size': 1234,
             'mimetype': 'text/plain',
             'create_datetime': '2024-01-01T12:00:00'
-        }
+        }).encode()
         mock_get.return_value.status_code = 200
         result = self.runner.invoke(file_client, ['stat', '123', '--backend', 'rest'])
         self.assertIn("File Metadata:", result.output)
         self.assertEqual(result.exit_code, 0)
+        self.assertEqual(mock_get.call_args.args[0], 'http://localhost/file/123/stat/')
 
-    @patch('file_client.requests.get')
+    @patch('file_client._SESSION.get')
     def test_rest_stat_not_found(self, mock_get):
         # Simulate a 404 error for missing file
         mock_get.return_value.status_code = 404
@@ -39,11 +77,28 @@ class TestFileClient(unittest.TestCase):
         self.assertIn("File not found", result.output)
         self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
 
-    @patch('file_client.grpc.insecure_channel')
-    def test_grpc_stat_success(self, mock_channel):
+    @patch('file_client._SESSION.get')
+    def test_rest_statread_success(self, mock_get):
+        # Simulate a combined REST response with metadata headers
+        response = mock_get.return_value.__enter__.return_value
+        response.status_code = 200
+        response.headers = {
+            'X-Meta-Name': 'example.txt',
+            'X-Meta-Size': '11',
+            'X-Meta-Mimetype': 'text/plain',
+            'X-Meta-Create-Datetime': '2024-01-01T12:00:00',
+        }
+        response.raw = io.BytesIO(b'hello world')
+        result = self.runner.invoke(file_client, ['statread', '123', '--backend', 'rest'])
+        self.assertIn("- Name: example.txt", result.output)
+        self.assertIn("hello world", result.output)
+        self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_stat_success(self, mock_get_stub, mock_pb2):
         # Simulate a successful gRPC response for metadata
-        mock_stub = MagicMock()
-        mock_channel.return_value.__enter__.return_value = mock_stub
+        mock_stub = mock_get_stub.return_value
         mock_stub.Stat.return_value = MagicMock(
             name="example.txt", size=1234, mimetype="text/plain", create_datetime="2024-01-01T12:00:00"
         )
@@ -51,23 +106,327 @@ class TestFileClient(unittest.TestCase):
         self.assertIn("File Metadata:", result.output)
         self.assertEqual(result.exit_code, 0)
 
-    @patch('file_client.grpc.insecure_channel')
-    def test_grpc_stat_not_found(self, mock_channel):
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_stat_not_found(self, mock_get_stub, mock_pb2):
         # Simulate a gRPC NOT_FOUND error
-        mock_channel.side_effect = grpc.RpcError("NOT_FOUND")
+        mock_get_stub.return_value.Stat.side_effect = MockRpcError(grpc.StatusCode.NOT_FOUND)
         result = self.runner.invoke(file_client, ['stat', '123', '--backend', 'grpc'])
         self.assertIn("File not found", result.output)
         self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
 
+    @patch('file_client._SESSION.get')
+    def test_rest_stat_unavailable(self, mock_get):
+        # Simulate a 503 from a gateway in front of the backend
+        mock_get.return_value.status_code = 503
+        result = self.runner.invoke(file_client, ['stat', '123', '--backend', 'rest'])
+        self.assertIn("Could not connect to the server", result.output)
+        self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
+
+    @patch('file_client._SESSION.get')
+    def test_rest_read_success(self, mock_get):
+        # Simulate a streamed REST response for file content
+        response = mock_get.return_value.__enter__.return_value
+        response.status_code = 200
+        response.headers = {'Content-Type': 'text/plain'}
+        response.raw = io.BytesIO(b'hello world')
+        result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest'])
+        self.assertIn("hello world", result.output)
+        self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client._SESSION.get')
+    def test_rest_read_not_found(self, mock_get):
+        # Simulate a 404 error for missing file content
+        mock_get.return_value.__enter__.return_value.status_code = 404
+        result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest'])
+        self.assertIn("File not found", result.output)
+        self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_read_streams_chunks(self, mock_get_stub, mock_pb2):
+        # Simulate a server-streaming gRPC read split over several replies
+        mock_get_stub.return_value.Read.return_value = MockStreamCall([
+            MagicMock(data=MagicMock(data=b'hello ')),
+            MagicMock(data=MagicMock(data=b'world')),
+        ])
+        result = self.runner.invoke(file_client, ['read', '123', '--backend', 'grpc'])
+        self.assertIn("hello world", result.output)
+        self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_read_output_to_file(self, mock_get_stub, mock_pb2):
+        # Test gRPC `read` maps the output file using the size from a concurrent stat
+        mock_stub = mock_get_stub.return_value
+        mock_stub.Stat.future.return_value.result.return_value = MagicMock(size=14)
+        mock_stub.Read.return_value = MockStreamCall([
+            MagicMock(data=MagicMock(data=b'chunk-1')),
+            MagicMock(data=MagicMock(data=b'chunk-2')),
+        ])
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(file_client, ['read', '123', '--backend', 'grpc', '--output', 'output.bin'])
+            with open('output.bin', 'rb') as f:
+                content = f.read()
+            self.assertEqual(content, b'chunk-1chunk-2')
+            self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_statread_success(self, mock_get_stub, mock_pb2):
+        # Simulate a combined gRPC call returning metadata then content
+        meta = MagicMock(size=11, mimetype="text/plain", create_datetime="2024-01-01T12:00:00")
+        meta.name = "example.txt"
+        mock_get_stub.return_value.StatRead.return_value = MockStreamCall([
+            MagicMock(meta=meta, **{'WhichOneof.return_value': 'meta'}),
+            MagicMock(chunk=MagicMock(data=b'hello world'), **{'WhichOneof.return_value': 'chunk'}),
+        ])
+        result = self.runner.invoke(file_client, ['statread', '123', '--backend', 'grpc'])
+        self.assertIn("- Name: example.txt", result.output)
+        self.assertIn("hello world", result.output)
+        self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client._stub')
+    def test_grpc_statread_requires_metadata_first(self, mock_get_stub, mock_pb2):
+        # A stream opening with content instead of metadata is an error, not an empty file
+        call = MockStreamCall([
+            MagicMock(chunk=MagicMock(data=b'hello world'), **{'WhichOneof.return_value': 'chunk'}),
+        ])
+        mock_get_stub.return_value.StatRead.return_value = call
+        result = self.runner.invoke(file_client, ['statread', '123', '--backend', 'grpc'])
+        self.assertNotIn("File Metadata:", result.output)
+        self.assertTrue(call.cancelled)
+        self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client.grpc.aio.insecure_channel')
+    def test_grpc_batch_stat(self, mock_channel, mock_pb2):
+        # Stat several UUIDs concurrently and report each one in order
+        async def stat(request):
+            if request is missing:
+                raise MockRpcError(grpc.StatusCode.NOT_FOUND)
+            response = MagicMock(size=1234, mimetype="text/plain", create_datetime="2024-01-01T12:00:00")
+            response.name = "example.txt"
+            return response
+
+        missing = MagicMock()
+        mock_pb2.StatRequest.side_effect = lambda uuid: missing if uuid == '456' else MagicMock()
+        with patch('file_client.service_file_pb2_grpc.FileServiceStub', create=True) as mock_stub_cls:
+            mock_stub_cls.return_value.Stat.side_effect = stat
+            with self.runner.isolated_filesystem():
+                with open('uuids.txt', 'w') as f:
+                    f.write("123\n456\n\n789\n")
+                result = self.runner.invoke(file_client, ['stat', '--uuids-file', 'uuids.txt', '--backend', 'grpc'])
+        self.assertEqual(result.output.count("File Metadata:"), 2)
+        self.assertIn("456: File not found", result.output)
+        self.assertNotEqual(result.exit_code, 0)  # Expect non-zero exit code
+
+    @patch('file_client.BATCH_CONCURRENCY', 2)
+    @patch('file_client.service_file_pb2')
+    @patch('file_client.grpc.aio.insecure_channel')
+    def test_grpc_batch_read_bounded(self, mock_channel, mock_pb2):
+        # Batch reads never run more than BATCH_CONCURRENCY streams at once
+        active = 0
+        peak = 0
+
+        async def read(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            yield MagicMock(data=MagicMock(data=b'content'))
+            active -= 1
+
+        with patch('file_client.service_file_pb2_grpc.FileServiceStub', create=True) as mock_stub_cls:
+            mock_stub_cls.return_value.Read.side_effect = read
+            with self.runner.isolated_filesystem():
+                with open('uuids.txt', 'w') as f:
+                    f.write("\n".join(str(n) for n in range(6)))
+                result = self.runner.invoke(file_client, ['read', '--uuids-file', 'uuids.txt',
+                                                          '--backend', 'grpc', '--output', 'out'])
+                self.assertEqual(sorted(os.listdir('out')), [str(n) for n in range(6)])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(peak, 2)
+
+    def test_uuids_file_rejects_single_call_options(self):
+        # Options that batch mode cannot honour are refused instead of ignored
+        for option in ('--grpc-pool-size', '--rest-workers'):
+            with self.runner.isolated_filesystem():
+                with open('uuids.txt', 'w') as f:
+                    f.write("123\n")
+                result = self.runner.invoke(file_client, ['stat', '--uuids-file', 'uuids.txt', option, '4'])
+            self.assertIn("cannot be combined with --uuids-file", result.output)
+            self.assertNotEqual(result.exit_code, 0)
+
+    def test_uuid_and_uuids_file_exclusive(self):
+        # A UUID argument cannot be combined with --uuids-file
+        with self.runner.isolated_filesystem():
+            with open('uuids.txt', 'w') as f:
+                f.write("123\n")
+            result = self.runner.invoke(file_client, ['stat', '123', '--uuids-file', 'uuids.txt'])
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_uuids_file_rejects_paths(self):
+        # UUIDs that could escape the --output directory are refused before any request
+        for bad_uuid in ('/etc/passwd', '../escape', 'nested/uuid'):
+            with self.runner.isolated_filesystem():
+                with open('uuids.txt', 'w') as f:
+                    f.write(f"123\n{bad_uuid}\n")
+                result = self.runner.invoke(file_client, ['read', '--uuids-file', 'uuids.txt', '--output', 'out'])
+            self.assertIn("Invalid UUID", result.output)
+            self.assertNotEqual(result.exit_code, 0)
+
+    @patch('file_client.service_file_pb2')
+    @patch('file_client.grpc.insecure_channel')
+    def test_grpc_channel_reused(self, mock_channel, mock_pb2):
+        # Repeated calls to the same server share one channel
+        file_client_module._close_channels()
+        self.addCleanup(file_client_module._close_channels)
+        with patch('file_client.service_file_pb2_grpc.FileServiceStub', create=True) as mock_stub_cls:
+            mock_stub_cls.return_value.Stat.return_value = MagicMock(
+                name="example.txt", size=1234, mimetype="text/plain", create_datetime="2024-01-01T12:00:00"
+            )
+            for _ in range(3):
+                result = self.runner.invoke(file_client, ['stat', '123', '--backend', 'grpc'])
+                self.assertEqual(result.exit_code, 0)
+        mock_channel.assert_called_once()
+
+    @patch('file_client.grpc.insecure_channel')
+    def test_grpc_pool_round_robin(self, mock_channel):
+        # Calls are spread over every channel in the pool
+        file_client_module._close_channels()
+        self.addCleanup(file_client_module._close_channels)
+        mock_channel.side_effect = lambda *args, **kwargs: MagicMock()
+        with patch('file_client.service_file_pb2_grpc.FileServiceStub', create=True) as mock_stub_cls:
+            mock_stub_cls.side_effect = lambda channel: MagicMock(channel=channel)
+            picked = {file_client_module._stub('localhost:50051', 3).channel for _ in range(6)}
+        self.assertEqual(mock_channel.call_count, 3)
+        self.assertEqual(len(picked), 3)
+
+    def test_prefetch_propagates_errors(self):
+        # Chunks received in the background arrive in order, followed by any receive error
+        def chunks():
+            yield b'chunk-1'
+            yield b'chunk-2'
+            raise ConnectionError("connection reset")
+
+        received = []
+        with self.assertRaises(ConnectionError):
+            for chunk in file_client_module._prefetch(chunks()):
+                received.append(chunk)
+        self.assertEqual(received, [b'chunk-1', b'chunk-2'])
+
+    @unittest.skipUnless(hasattr(os, 'O_DIRECT'), "O_DIRECT is not available")
+    @patch('file_client.CHUNK_SIZE', 4)
+    def test_read_output_to_file_direct(self):
+        # Test `read --direct` writes whole aligned blocks and trims the unaligned tail
+        body = bytes(range(256)) * 40
+        with patch('file_client._SESSION.get') as mock_get:
+            response = mock_get.return_value.__enter__.return_value
+            response.status_code = 200
+            response.raw = io.BytesIO(body)
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest',
+                                                          '--direct', '--output', 'output.bin'])
+                with open('output.bin', 'rb') as f:
+                    content = f.read()
+                self.assertEqual(content, body)
+                self.assertEqual(result.exit_code, 0)
+
+    def test_prefetch_stops_when_writer_fails(self):
+        # A failing writer aborts the source and leaves no receiving thread behind
+        aborted = threading.Event()
+
+        def chunks():
+            yield b'chunk-1chunk-2'
+            aborted.wait(5)  # Blocks like a network read until the source is aborted
+            yield b'chunk-3'
+
+        with self.runner.isolated_filesystem():
+            with self.assertRaises(OSError):
+                file_client_module._save_chunks(chunks(), 'output.bin', length=4, close=aborted.set)
+        self.assertTrue(aborted.is_set())
+        self.assertFalse([t for t in threading.enumerate() if t.name == 'file-client-prefetch'])
+
+    @unittest.skipUnless(hasattr(os, 'posix_fallocate'), "posix_fallocate is not available")
+    def test_presize_fallback_only_when_unsupported(self):
+        # Unsupported fallocate falls back to truncate, a full disk is reported
+        with self.runner.isolated_filesystem():
+            with open('output.bin', 'w+b') as f:
+                with patch('file_client.os.posix_fallocate', side_effect=OSError(errno.EOPNOTSUPP, "unsupported")):
+                    file_client_module._presize(f, 16)
+                self.assertEqual(os.fstat(f.fileno()).st_size, 16)
+                with patch('file_client.os.posix_fallocate', side_effect=OSError(errno.ENOSPC, "no space")):
+                    with self.assertRaises(OSError):
+                        file_client_module._presize(f, 32)
+
+    @unittest.skipUnless(hasattr(os, 'O_DIRECT'), "O_DIRECT is not available")
+    def test_direct_short_write_fails(self):
+        # A short O_DIRECT write that breaks block alignment is an error, not a misplaced file
+        with patch('file_client.os.write', return_value=100):
+            with self.runner.isolated_filesystem():
+                with self.assertRaises(OSError):
+                    file_client_module._copy_direct(iter([b'x' * 10]), 'output.bin')
+
+    def test_direct_requires_file_output(self):
+        # --direct is refused where it would otherwise be ignored
+        for args in (['read', '123'], ['read', '--uuids-file', 'uuids.txt', '--output', 'out']):
+            with self.runner.isolated_filesystem():
+                with open('uuids.txt', 'w') as f:
+                    f.write("123\n")
+                result = self.runner.invoke(file_client, args + ['--direct'])
+            self.assertIn("--direct needs", result.output)
+            self.assertNotEqual(result.exit_code, 0)
+
+    def test_text_encoding(self):
+        # Only textual MIME types are decoded for the terminal, honouring their charset
+        self.assertEqual(file_client_module._text_encoding('text/plain'), 'utf-8')
+        self.assertEqual(file_client_module._text_encoding('text/csv; charset="ISO-8859-1"'), 'iso8859-1')
+        self.assertIsNone(file_client_module._text_encoding('application/octet-stream'))
+
+    @patch('file_client.grpc.insecure_channel')
+    def test_grpc_pool_opened_once_under_contention(self, mock_channel):
+        # Threads racing on first use share a single pool
+        file_client_module._close_channels()
+        self.addCleanup(file_client_module._close_channels)
+        barrier = threading.Barrier(8)
+
+        def open_channel(*args, **kwargs):
+            time.sleep(0.01)
+            return MagicMock()
+
+        mock_channel.side_effect = open_channel
+        with patch('file_client.service_file_pb2_grpc.FileServiceStub', create=True):
+            threads = [threading.Thread(target=lambda: (barrier.wait(), file_client_module._stub('localhost:50051', 2)))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(mock_channel.call_count, 2)
+
+    def test_verbose_logs_errors(self):
+        # Error details reach stderr only with --verbose
+        root = logging.getLogger()
+        with patch.object(root, 'handlers', []), patch.object(root, 'level', root.level):
+            with patch('file_client._SESSION.get', side_effect=ValueError("connection pool broke")):
+                quiet = self.runner.invoke(file_client, ['stat', '123', '--backend', 'rest'])
+                verbose = self.runner.invoke(file_client, ['stat', '123', '--backend', 'rest', '--verbose'])
+        self.assertEqual(quiet.stderr, '')
+        self.assertIn("ERROR - Error during REST stat request: connection pool broke", verbose.stderr)
+        self.assertNotEqual(quiet.exit_code, 0)
+        self.assertNotEqual(verbose.exit_code, 0)
+
     def test_stat_output_to_file(self):
         # Test `stat` command output to a file
-        with patch('file_client.requests.get') as mock_get:
-            mock_get.return_value.json.return_value = {
+        with patch('file_client._SESSION.get') as mock_get:
+            mock_get.return_value.content = json.dumps({
                 'name': 'example.txt',
                 'size': 1234,
                 'mimetype': 'text/plain',
                 'create_datetime': '2024-01-01T12:00:00'
-            }
+            }).encode()
             mock_get.return_value.status_code = 200
             with self.runner.isolated_filesystem():
                 result = self.runner.invoke(file_client, ['stat', '123', '--backend', 'rest', '--output', 'output.txt'])
@@ -76,5 +435,93 @@ class TestFileClient(unittest.TestCase):
                 self.assertIn("File Metadata:", content)
                 self.assertEqual(result.exit_code, 0)
 
+    def test_read_output_to_file(self):
+        # Test `read` command streams content to a file
+        with patch('file_client._SESSION.get') as mock_get:
+            response = mock_get.return_value.__enter__.return_value
+            response.status_code = 200
+            response.raw = io.BytesIO(b'chunk-1chunk-2')
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest', '--output', 'output.bin'])
+                with open('output.bin', 'rb') as f:
+                    content = f.read()
+                self.assertEqual(content, b'chunk-1chunk-2')
+                self.assertEqual(result.exit_code, 0)
+
+    def test_read_output_to_file_with_length(self):
+        # Test `read` command maps the output file when Content-Length is known
+        with patch('file_client._SESSION.get') as mock_get:
+            response = mock_get.return_value.__enter__.return_value
+            response.status_code = 200
+            response.headers = {'Content-Length': '14'}
+            response.raw = io.BytesIO(b'chunk-1chunk-2')
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest', '--output', 'output.bin'])
+                with open('output.bin', 'rb') as f:
+                    content = f.read()
+                self.assertEqual(content, b'chunk-1chunk-2')
+                self.assertEqual(result.exit_code, 0)
+
+    def test_read_short_body_leaves_no_file(self):
+        # A body shorter than its Content-Length fails without leaving a pre-sized file behind
+        with patch('file_client._SESSION.get') as mock_get:
+            response = mock_get.return_value.__enter__.return_value
+            response.status_code = 200
+            response.headers = {'Content-Length': '28'}
+            response.raw = io.BytesIO(b'chunk-1chunk-2')
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest', '--output', 'output.bin'])
+                self.assertFalse(os.path.exists('output.bin'))
+                self.assertNotEqual(result.exit_code, 0)
+
+    @patch('file_client.CHUNK_SIZE', 4)
+    def test_read_output_to_file_with_ranges(self):
+        # Test `read` command splits the download over parallel Range requests
+        body = b'chunk-1chunk-2'
+
+        def ranged_get(url, headers, **kwargs):
+            start, end = (int(n) for n in headers['Range'][len('bytes='):].split('-'))
+            response = MagicMock(status_code=206)
+            response.__enter__.return_value = response
+            response.headers = {'Content-Range': f'bytes {start}-{end}/{len(body)}'}
+            response.iter_content.return_value = [body[start:end + 1]]
+            return response
+
+        with patch('file_client._SESSION.head') as mock_head, patch('file_client._SESSION.get') as mock_get:
+            mock_head.return_value.status_code = 200
+            mock_head.return_value.headers = {'Content-Length': str(len(body)), 'Accept-Ranges': 'bytes'}
+            mock_get.side_effect = ranged_get
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest',
+                                                          '--rest-workers', '3', '--output', 'output.bin'])
+                with open('output.bin', 'rb') as f:
+                    content = f.read()
+                self.assertEqual(content, body)
+                self.assertEqual(mock_get.call_count, 3)
+                self.assertEqual(result.exit_code, 0)
+
+    @patch('file_client.CHUNK_SIZE', 4)
+    def test_read_ranges_misplaced_content_range(self):
+        # Test `read` command fails when a 206 answers a different offset than requested
+        body = b'chunk-1chunk-2'
+
+        def ranged_get(url, headers, **kwargs):
+            start, end = (int(n) for n in headers['Range'][len('bytes='):].split('-'))
+            response = MagicMock(status_code=206)
+            response.__enter__.return_value = response
+            response.headers = {'Content-Range': f'bytes 0-{end - start}/{len(body)}'}
+            response.iter_content.return_value = [body[:end - start + 1]]
+            return response
+
+        with patch('file_client._SESSION.head') as mock_head, patch('file_client._SESSION.get') as mock_get:
+            mock_head.return_value.status_code = 200
+            mock_head.return_value.headers = {'Content-Length': str(len(body)), 'Accept-Ranges': 'bytes'}
+            mock_get.side_effect = ranged_get
+            with self.runner.isolated_filesystem():
+                result = self.runner.invoke(file_client, ['read', '123', '--backend', 'rest',
+                                                          '--rest-workers', '3', '--output', 'output.bin'])
+                self.assertFalse(os.path.exists('output.bin'))
+                self.assertNotEqual(result.exit_code, 0)
+
 if __name__ == '__main__':
     unittest.main()